@@ -1,28 +1,37 @@
 from fastapi import APIRouter, HTTPException, status, UploadFile, File
 from typing import List, Dict, Any
+import asyncio
+import json
 import logging
-from fastapi.responses import StreamingResponse, JSONResponse
+from fastapi.responses import StreamingResponse, JSONResponse, ORJSONResponse, Response
 import os
+import shutil
 from pathlib import Path
 import datetime
 
 
 from app.services.speech_to_text import get_transcript
+from app.db.database import SessionLocal
+from app.core.chat_processor import get_or_create_conversation, process_chat_message_stream
 from app.core.agent_utils import (
     extract_pitch_context,
     analyze_pitch,
     conduct_market_research,
     generate_pitch_deck_content
 )
-from app.schemas.schemas import PitchContext, PitchContextExtraction, PitchEvaluation, PitchDeckContent, JSXPitchDeckOutput, PitchDeckResponse, TranscriptionResponse, EnhancedFeedbackResponse, MarketResearchResponse, CompetitorResponse, MarketSizeResponse, MarketTrendResponse, ContextExtractionResponse, ChatRequest
-# Set up logging
-logging.basicConfig(level=logging.INFO)
+from app.schemas.schemas import PitchContext, PitchContextExtraction, PitchEvaluation, PitchDeckContent, JSXPitchDeckOutput, PitchDeckResponse, TranscriptionResponse, EnhancedFeedbackResponse, MarketResearchResponse, ChatRequest
 logger = logging.getLogger(__name__)
 
 # Create routers
 video_router = APIRouter(tags=["video"])
+chat_router = APIRouter(tags=["chat"])
 
-@video_router.post("/transcribe", response_model=TranscriptionResponse)
+def _save_upload(upload: UploadFile, path: Path) -> None:
+    """Copy an uploaded file to path in 1 MiB blocks rather than reading it all into memory"""
+    with open(path, "wb", buffering=1 << 20) as f:
+        shutil.copyfileobj(upload.file, f, length=1 << 20)
+
+@video_router.post("/transcribe", responses={200: {"model": TranscriptionResponse}})
 async def transcribe_video(
     video: UploadFile = File(...),
 ):
@@ -34,14 +43,12 @@ async def transcribe_video(
         media_dir = Path("media")
         media_dir.mkdir(exist_ok=True)
         
-        # Save uploaded video
+        # Save uploaded video on a worker thread so the event loop keeps serving requests
         video_path = media_dir / video.filename
-        with open(video_path, "wb") as f:
-            content = await video.read()
-            f.write(content)
+        await asyncio.to_thread(_save_upload, video, video_path)
 
         # Get transcript from OpenAI API
-        transcript = get_transcript(str(video_path))
+        transcript = await get_transcript(str(video_path))
         
         if isinstance(transcript, str) and transcript.startswith("Error:"):
             raise HTTPException(
@@ -49,9 +56,7 @@ async def transcribe_video(
                 detail=transcript
             )
 
-        return TranscriptionResponse(
-            transcript=transcript
-        )
+        return ORJSONResponse({"transcript": transcript})
 
     except Exception as e:
         logger.error(f"Error in transcribe_video: {str(e)}")
@@ -60,7 +65,7 @@ async def transcribe_video(
             detail=f"An error occurred: {str(e)}"
         )
 
-@video_router.post("/analyze", response_model=EnhancedFeedbackResponse)
+@video_router.post("/analyze", responses={200: {"model": EnhancedFeedbackResponse}})
 async def analyze_transcript(
     request: ChatRequest,
 ):
@@ -68,43 +73,25 @@ async def analyze_transcript(
     Analyze a transcript and get structured feedback with context extraction.
     The transcript should be provided in the message field of the request.
     
-    This endpoint performs two steps:
+    This endpoint performs two independent steps concurrently:
     1. Extract context (industry, verticals, problem) from the transcript
     2. Analyze the pitch quality and provide structured feedback
     """
     try:
-        # First, extract context from the transcript
-        context_extraction = await extract_pitch_context(pitch_content=request.message)
+        # Extract context and analyze the pitch at the same time
+        context_extraction, result = await asyncio.gather(
+            extract_pitch_context(pitch_content=request.message),
+            analyze_pitch(pitch_content=request.message)
+        )
         
         # Log the extracted context
         logger.info(f"Extracted context: Industry={context_extraction.industry}, "
                    f"Verticals={context_extraction.verticals}, "
                    f"Problem={context_extraction.problem}")
-        
-        # Then, analyze the pitch with the extracted context
-        result = await analyze_pitch(
-            pitch_content=request.message,
-            context_extraction=context_extraction
-        )
 
-        # Return both the analysis results and the extracted context
-        return EnhancedFeedbackResponse(
-            clarity=result.clarity,
-            clarity_feedback=result.clarity_feedback,
-            content=result.content,
-            content_feedback=result.content_feedback,
-            structure=result.structure,
-            structure_feedback=result.structure_feedback,
-            delivery=result.delivery,
-            delivery_feedback=result.delivery_feedback,
-            feedback=result.feedback,
-            context=ContextExtractionResponse(
-                industry=context_extraction.industry,
-                verticals=context_extraction.verticals,
-                problem=context_extraction.problem,
-                summary=context_extraction.summary
-            )
-        )
+        # Return both the analysis results and the extracted context; the agent
+        # outputs already match EnhancedFeedbackResponse field for field
+        return ORJSONResponse({**result.model_dump(), "context": context_extraction.model_dump()})
 
     except Exception as e:
         logger.error(f"Error in analyze_transcript: {str(e)}")
@@ -113,7 +100,7 @@ async def analyze_transcript(
             detail=f"An error occurred: {str(e)}"
         )
 
-@video_router.post("/market-research", response_model=MarketResearchResponse)
+@video_router.post("/market-research", responses={200: {"model": MarketResearchResponse}})
 async def research_market(
     request: ChatRequest,
 ):
@@ -132,7 +119,6 @@ async def research_market(
     try:
         # Parse the context from the request message
         try:
-            import json
             context_data = json.loads(request.message)
             
             # Log parsed data
@@ -165,34 +151,31 @@ async def research_market(
         # Add logging to help with debugging
         logger.info(f"Research results type: {type(research_results).__name__}")
         
-        # Convert to response schema - now handling dictionary access with get()
-        competitors = [
-            CompetitorResponse(
-                name=comp.get("name", ""),
-                description=comp.get("description", ""),
-                url=comp.get("url")
-            ) for comp in research_results.get("competitors", [])
-        ]
-        
-        market_size = MarketSizeResponse(
-            overall=research_results.get("market_size", {}).get("overall", "Unknown"),
-            growth=research_results.get("market_size", {}).get("growth"),
-            projection=research_results.get("market_size", {}).get("projection")
-        )
-        
-        trends = [
-            MarketTrendResponse(
-                title=trend.get("title", ""),
-                description=trend.get("description", "")
-            ) for trend in research_results.get("trends", [])
-        ]
-        
-        return MarketResearchResponse(
-            competitors=competitors,
-            market_size=market_size,
-            trends=trends,
-            summary=research_results.get("summary", "No summary available")
-        )
+        # The research is free-form agent JSON, so validate it once against the
+        # response schema before returning it
+        research_size = research_results.get("market_size") or {}
+        response = MarketResearchResponse.model_validate({
+            "competitors": [
+                {
+                    "name": comp.get("name", ""),
+                    "description": comp.get("description", ""),
+                    "url": comp.get("url")
+                } for comp in research_results.get("competitors", ())
+            ],
+            "market_size": {
+                "overall": research_size.get("overall", "Unknown"),
+                "growth": research_size.get("growth"),
+                "projection": research_size.get("projection")
+            },
+            "trends": [
+                {
+                    "title": trend.get("title", ""),
+                    "description": trend.get("description", "")
+                } for trend in research_results.get("trends", ())
+            ],
+            "summary": research_results.get("summary", "No summary available")
+        })
+        return Response(content=response.model_dump_json(), media_type="application/json")
 
     except Exception as e:
         logger.error(f"Error in research_market: {str(e)}")
@@ -216,7 +199,6 @@ async def generate_deck_content(
     
     try:
         # Parse the context from the request message
-        import json
         logger.info(f"Request received: {request}")
         logger.info(f"Request message preview (first 200 chars): {request.message[:200]}")
         
@@ -283,12 +265,11 @@ async def generate_deck_content(
             pitch_evaluation=pitch_evaluation
         )
         
-        # Convert the Pydantic model to a dictionary for the JSON response
         logger.info(f"Generated pitch deck response - Overview length: {len(pitch_deck_response.overview)}")
         logger.info(f"JSX code length: {len(pitch_deck_response.jsx_code)}")
         
-        # Return the model as a JSON response
-        return JSONResponse(content=pitch_deck_response.dict())
+        # Return the model serialized by pydantic-core
+        return Response(content=pitch_deck_response.model_dump_json(), media_type="application/json")
         
     except Exception as e:
         logger.error(f"Error in generate_deck_content: {str(e)}")
@@ -304,4 +285,41 @@ async def test_connection():
     Simple endpoint to test API connectivity
     """
     logger.info("Test connection endpoint called")
-    return {"status": "ok", "message": "API is working"} 
\ No newline at end of file
+    return {"status": "ok", "message": "API is working"} 
+
+@chat_router.post("/stream")
+async def stream_chat(
+    request: ChatRequest,
+):
+    """
+    Send a chat message and stream the response as server-sent events.
+    Each event carries a JSON-encoded piece of the response text, and the
+    conversation ID is returned in the X-Conversation-Id header.
+    """
+    # The session must outlive this handler, so it is closed when the stream ends
+    db = SessionLocal()
+    try:
+        conversation = await get_or_create_conversation(
+            db, request.message, request.conversation_id
+        )
+    except Exception as e:
+        db.close()
+        logger.error(f"Error in stream_chat: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"An error occurred: {str(e)}"
+        )
+    
+    async def event_stream():
+        try:
+            async for chunk in process_chat_message_stream(db, request.message, conversation):
+                yield f"data: {json.dumps(chunk)}\n\n"
+            yield "event: done\ndata: {}\n\n"
+        finally:
+            db.close()
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"X-Conversation-Id": conversation.id}
+    )
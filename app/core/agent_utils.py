@@ -1,16 +1,40 @@
 from agents import Agent, Runner, trace , WebSearchTool
-from app.schemas.schemas import PitchContext, PitchContextExtraction, PitchEvaluation, PitchDeckContent, JSXPitchDeckOutput, PitchDeckResponse
-from typing import Optional, List, Dict, Any
+from app.core.cache import TTLCache
+from app.core.semantic_cache import SemanticResponseCache
+from app.schemas.schemas import PitchContext, PitchContextExtraction, PitchEvaluation, MarketResearchResults, PitchDeckContent, JSXPitchDeckOutput, PitchDeckResponse
+from typing import AsyncIterator, Final, Optional, List, Dict, Any
+from openai.types.responses import ResponseTextDeltaEvent
 
+import asyncio
+import hashlib
+import json
 import os
-from dotenv import load_dotenv
+import re
+import string
+import textwrap
+from itertools import islice
+from urllib.parse import quote_plus
+from app.core.config import load_env
 import logging
+from pydantic import ValidationError
 
 # Load environment variables
-load_dotenv()
+load_env()
+
+logger = logging.getLogger(__name__)
+
+# PEACHME_DEBUG=1 turns on the verbose agent tracing logged at DEBUG level
+if os.getenv("PEACHME_DEBUG") == "1":
+    logger.setLevel(logging.DEBUG)
 
 
 # Create agents for different purposes
+#
+# Agent instructions are sent as the system message at the start of every
+# request, so OpenAI's automatic prompt caching can reuse them as a shared
+# prefix. Keep them as static strings: interpolating per-request values here
+# would break the prefix match, and any edit to an instructions block
+# invalidates its cached prefix on the next deploy.
 context_extraction_agent = Agent[PitchContext](
     name="context_extraction_agent",
     instructions="""You are an expert at analyzing pitch transcripts and extracting key contextual information.
@@ -275,6 +299,26 @@ jsx_pitch_deck_agent = Agent(
     output_type=JSXPitchDeckOutput,
 )
 
+# Cap concurrent agent runs per worker to stay within the provider's rate limits.
+# Streamed chat replies last as long as the client keeps reading, so they get
+# their own limit rather than holding slots the other endpoints need.
+_RUN_SEMAPHORE = asyncio.Semaphore(int(os.getenv("AGENT_MAX_CONCURRENCY", "10")))
+_STREAM_SEMAPHORE = asyncio.Semaphore(int(os.getenv("CHAT_STREAM_MAX_CONCURRENCY", "20")))
+
+async def _run_agent(agent: Agent, input: str):
+    """
+    Run an agent, waiting for a free slot if too many runs are in flight.
+    
+    Args:
+        agent: The agent to run
+        input: The prompt for the agent
+        
+    Returns:
+        The RunResult from the agents SDK
+    """
+    async with _RUN_SEMAPHORE:
+        return await Runner.run(agent, input)
+
 def create_pitch_context(
     conversation_history: Optional[List[Dict[str, Any]]] = None,
     pitch_content: Optional[str] = None
@@ -294,6 +338,9 @@ def create_pitch_context(
         pitch_content=pitch_content
     )
 
+# Context extractions (as asyncio tasks) keyed by a digest of the pitch transcript
+_extraction_cache = TTLCache(maxsize=256)
+
 async def extract_pitch_context(
     pitch_content: str,
     conversation_history: Optional[List[Dict[str, Any]]] = None,
@@ -308,25 +355,39 @@ async def extract_pitch_context(
     Returns:
         PitchContextExtraction object containing industry, verticals, and problem
     """
-    with trace("Pitch Context Extraction") as current_trace:
-        # Create context with conversation history and pitch content
-        context = create_pitch_context(
-            conversation_history=conversation_history,
-            pitch_content=pitch_content
-        )
-            
-        # Run the extraction with context and tracing
-        result = await Runner.run(
+    # Identical transcripts share one extraction, including calls still in flight
+    cache_key = hashlib.blake2b(pitch_content.encode(), digest_size=16).digest()
+    task = _extraction_cache.get(cache_key)
+    if task is None:
+        task = asyncio.ensure_future(_run_context_extraction(pitch_content))
+        _extraction_cache.set(cache_key, task)
+    
+    try:
+        # Shield so a cancelled request doesn't cancel the shared extraction
+        return await asyncio.shield(task)
+    except Exception:
+        # Don't keep failures around; the next call retries
+        if _extraction_cache.get(cache_key) is task:
+            _extraction_cache.pop(cache_key)
+        raise
+
+async def _run_context_extraction(pitch_content: str) -> PitchContextExtraction:
+    """Run the context extraction agent on a pitch transcript"""
+    with trace("Pitch Context Extraction"):
+        # Run the extraction with tracing
+        result = await _run_agent(
             context_extraction_agent,
             pitch_content
         )
         
         return result.final_output
 
+# Pitch evaluations keyed by a digest of the pitch transcript
+_analysis_cache = TTLCache(maxsize=256, ttl=3600)
+
 async def analyze_pitch(
     pitch_content: str,
     conversation_history: Optional[List[Dict[str, Any]]] = None,
-    context_extraction: Optional[PitchContextExtraction] = None,
 ) -> PitchEvaluation:
     """
     Analyze a pitch using the pitch analysis agent.
@@ -334,32 +395,33 @@ async def analyze_pitch(
     Args:
         pitch_content: The pitch text to analyze
         conversation_history: Optional list of previous messages
-        context_extraction: Optional context extraction results
         
     Returns:
         PitchEvaluation object containing structured feedback
     """
-    with trace("Pitch Analysis") as current_trace:
-        # Create context with conversation history, pitch content, and extracted context
-        context = create_pitch_context(
-            conversation_history=conversation_history,
-            pitch_content=pitch_content
-        )
-        
-        # Add extracted context information if available
-        if context_extraction:
-            context.industry = context_extraction.industry
-            context.verticals = context_extraction.verticals
-            context.problem = context_extraction.problem
-            
-        # Run the analysis with context and tracing
-        result = await Runner.run(
+    cache_key = hashlib.blake2b(pitch_content.encode(), digest_size=16).digest()
+    cached = _analysis_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
+    with trace("Pitch Analysis"):
+        # Run the analysis with tracing
+        result = await _run_agent(
             pitch_analysis_agent,
             pitch_content
         )
         
+        _analysis_cache.set(cache_key, result.final_output)
         return result.final_output
 
+# Chat replies to opening questions, matched by embedding similarity. Off
+# unless SEMANTIC_CACHE_ENABLED=1, since every lookup costs an embedding call
+_chat_cache = (
+    SemanticResponseCache(threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92")))
+    if os.getenv("SEMANTIC_CACHE_ENABLED") == "1"
+    else None
+)
+
 async def chat_response(
     user_input: str,
     conversation_history: Optional[List[Dict[str, Any]]] = None,
@@ -374,20 +436,96 @@ async def chat_response(
     Returns:
         String response from the agent
     """
-    with trace("Chat Response") as current_trace:
-        # Create context with conversation history
-        context = create_pitch_context(
-            conversation_history=conversation_history
-        )
-            
-        # Generate response with context and tracing
-        result = await Runner.run(
+    # Opening questions are often paraphrases of each other; later turns
+    # depend on the conversation so they always go to the agent
+    query_embedding = None
+    if _chat_cache is not None and not conversation_history:
+        try:
+            query_embedding = await _chat_cache.embed(user_input)
+            cached = _chat_cache.lookup(query_embedding)
+            if cached is not None:
+                return cached
+        except Exception as e:
+            logger.warning("Semantic cache lookup failed, calling chat agent: %s", e)
+    
+    with trace("Chat Response"):
+        # Generate response with tracing
+        result = await _run_agent(
             chat_agent,
             user_input
         )
         
+        if query_embedding is not None:
+            _chat_cache.add(query_embedding, result.final_output)
         return result.final_output
 
+async def stream_chat_response(
+    user_input: str,
+    conversation_history: Optional[List[Dict[str, Any]]] = None,
+) -> AsyncIterator[str]:
+    """
+    Stream a chat response from the chat agent as text deltas.
+    
+    Args:
+        user_input: The user's message
+        conversation_history: Optional list of previous messages
+        
+    Yields:
+        Pieces of the response text as the model generates them
+    """
+    async with _STREAM_SEMAPHORE:
+        with trace("Chat Response Stream"):
+            result = Runner.run_streamed(chat_agent, user_input)
+            async for event in result.stream_events():
+                if event.type == "raw_response_event" and isinstance(event.data, ResponseTextDeltaEvent):
+                    yield event.data.delta
+
+# Prompt template for the market research agent ("$$" is a literal dollar sign)
+_RESEARCH_PROMPT_TMPL = string.Template(textwrap.dedent("""\
+    Research the following:
+    
+    Industry: $industry
+    Market Verticals: $verticals
+    Problem: $problem
+    
+    Please find:
+    1. Top competitors addressing this problem
+    2. Current market size (in $$ value)
+    3. Market growth rate and projections
+    4. Key market trends
+    
+    Provide structured, factual information with specific numbers and data points where possible.
+    
+    *** MANDATORY REQUIREMENT: You MUST include a specific source URL for EACH of these data points: ***
+    - Overall market size figure - MUST have a source URL
+    - Annual growth rate - MUST have a source URL
+    - Future market projection - MUST have a source URL
+    - Market trends - MUST have a source URL
+    
+    These source URLs are critical for our application to work correctly. Use the exact JSON format in the instructions.
+    
+    If projecting growth, explain how the projection was calculated.
+    Format your response as valid JSON matching the structure in the instructions.
+    """))
+
+# Base URL for fallback source links when the research agent omits a source
+_SEARCH_BASE = "https://www.google.com/search?q="
+
+# Fallback source URL per market size metric, formatted with the quoted industry
+_SOURCE_SEARCH_TMPL = {
+    "overall": _SEARCH_BASE + "{industry}+market+size",
+    "growth": _SEARCH_BASE + "{industry}+market+growth+rate",
+    "projection": _SEARCH_BASE + "{industry}+market+projection+future",
+}
+_TRENDS_SEARCH_TMPL = _SEARCH_BASE + "{industry}+market+trends+{verticals}"
+
+# Research results per normalized (industry, verticals, problem); web search
+# is the slowest step, so identical contexts within ten minutes reuse it
+_market_research_cache = TTLCache(maxsize=128, ttl=600)
+
+# Fenced code block, with or without a "json" language tag
+_JSON_FENCE = re.compile(r'```(?:json)?\s*\n(.*?)\n```', re.DOTALL)
+
 async def conduct_market_research(
     context_extraction: PitchContextExtraction,
 ) -> Dict[str, Any]:
@@ -400,250 +538,235 @@ async def conduct_market_research(
     Returns:
         Dictionary containing structured research findings
     """
-    print("="*80)
-    print(f"MARKET RESEARCH STARTED FOR: {context_extraction.industry}")
-    print(f"VERTICALS: {', '.join(context_extraction.verticals)}")
-    print(f"PROBLEM: {context_extraction.problem}")
-    print("="*80)
+    logger.debug(
+        "Market research started for industry=%s verticals=%s problem=%s",
+        context_extraction.industry, context_extraction.verticals, context_extraction.problem
+    )
+    
+    cache_key = (
+        context_extraction.industry.strip().lower(),
+        tuple(v.strip().lower() for v in context_extraction.verticals),
+        context_extraction.problem.strip().lower(),
+    )
+    cached = _market_research_cache.get(cache_key)
+    if cached is not None:
+        logger.debug("Returning cached market research for industry=%s", context_extraction.industry)
+        return cached
+    
+    # Quote the search terms once for every fallback source URL
+    industry_q = quote_plus(context_extraction.industry)
+    trends_search = _TRENDS_SEARCH_TMPL.format(
+        industry=industry_q,
+        verticals="+".join(map(quote_plus, context_extraction.verticals))
+    )
     
-    with trace("Market Research") as current_trace:
+    with trace("Market Research"):
         # Create search prompt
-        search_prompt = f"""
-        Research the following:
-        
-        Industry: {context_extraction.industry}
-        Market Verticals: {', '.join(context_extraction.verticals)}
-        Problem: {context_extraction.problem}
-        
-        Please find:
-        1. Top competitors addressing this problem
-        2. Current market size (in $ value)
-        3. Market growth rate and projections
-        4. Key market trends
-        
-        Provide structured, factual information with specific numbers and data points where possible.
-        
-        *** MANDATORY REQUIREMENT: You MUST include a specific source URL for EACH of these data points: ***
-        - Overall market size figure - MUST have a source URL
-        - Annual growth rate - MUST have a source URL
-        - Future market projection - MUST have a source URL
-        - Market trends - MUST have a source URL
-        
-        These source URLs are critical for our application to work correctly. Use the exact JSON format in the instructions.
-        
-        If projecting growth, explain how the projection was calculated.
-        Format your response as valid JSON matching the structure in the instructions.
-        """
-        
-        print("\nSENDING PROMPT TO RESEARCH AGENT:")
-        print("-"*60)
-        print(search_prompt.strip())
-        print("-"*60)
+        search_prompt = _RESEARCH_PROMPT_TMPL.substitute(
+            industry=context_extraction.industry,
+            verticals=", ".join(context_extraction.verticals),
+            problem=context_extraction.problem,
+        )
+        logger.debug("Sending prompt to research agent:\n%s", search_prompt)
         
         try:
-            print("\nWAITING FOR AGENT RESPONSE...")
             # Run the market research with context and tracing
-            result = await Runner.run(
+            result = await _run_agent(
                 market_research_agent,
                 search_prompt
             )
             
-            # Debug the result object
-            print(f"\nAGENT RESPONSE RECEIVED - Result Type: {type(result).__name__}")
-            logging.info(f"Result object type: {type(result).__name__}")
-            
-            # Try to identify what attributes are available
-            result_dir = dir(result)
-            print(f"Result object attributes: {', '.join(result_dir[:10])}...")
-            logging.info(f"Result object attributes: {result_dir}")
-            
-            # Extract JSON from response
-            import re
-            import json
-            
-            # Check for different possible attributes
-            response_text = None
-            for attr in ['output', 'response', 'content', 'text', 'message', 'final_output']:
-                if hasattr(result, attr):
-                    try:
-                        response_text = getattr(result, attr)
-                        print(f"Using result.{attr} for response text (type: {type(response_text)})")
-                        logging.info(f"Using result.{attr} (type: {type(response_text)})")
-                        break
-                    except Exception as attr_error:
-                        print(f"Error accessing attribute {attr}: {str(attr_error)}")
-                        logging.error(f"Error accessing attribute {attr}: {str(attr_error)}")
-            
-            # If no recognized attribute is found, use string representation
+            # The SDK returns the agent's answer as final_output
+            response_text = getattr(result, "final_output", None)
             if response_text is None:
-                try:
-                    response_text = str(result)
-                    print("No standard attributes found, using str(result)")
-                    logging.info("Using str(result)")
-                except Exception as str_error:
-                    print(f"Error converting result to string: {str_error}")
-                    logging.error(f"Error converting result to string: {str_error}")
-                    response_text = "Error: Could not extract response text"
+                response_text = str(result)
             
-            print(f"\nRAW RESPONSE PREVIEW (first 300 chars):")
-            print("-"*60)
-            print(f"{str(response_text)[:300]}...")
-            print("-"*60)
-            logging.info(f"Raw response (first 200 chars): {str(response_text)[:200]}...")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Raw response (first 300 chars): %s...", str(response_text)[:300])
             
-            # Try to find JSON in the response
-            print("\nEXTRACTING JSON FROM RESPONSE...")
-            try:
-                json_match = re.search(r'```json\n(.*?)\n```', str(response_text), re.DOTALL)
-                if json_match:
-                    json_str = json_match.group(1)
-                    print("Found JSON in code block with json marker")
-                    logging.info("Found JSON in code block with json marker")
-                else:
-                    json_match = re.search(r'```\n(.*?)\n```', str(response_text), re.DOTALL)
-                    if json_match:
-                        json_str = json_match.group(1)
-                        print("Found JSON in generic code block")
-                        logging.info("Found JSON in generic code block")
-                    else:
-                        # Just try to use the whole response
-                        json_str = str(response_text)
-                        print("No code blocks found, using entire response as JSON")
-                        logging.info("Using entire response as JSON")
-                
-                # Clean up potential issues in JSON
-                json_str = json_str.strip()
-                
-                # Try to parse JSON
-                print("\nPARSING JSON...")
-                print(f"JSON string to parse (first 200 chars): {json_str[:200]}...")
-                research_data = json.loads(json_str)
-                print(f"Successfully parsed JSON with {len(research_data)} keys: {', '.join(research_data.keys())}")
-                logging.info(f"Successfully parsed JSON with keys: {research_data.keys()}")
-            except Exception as json_error:
-                print(f"ERROR PARSING JSON: {str(json_error)}")
-                logging.error(f"Error parsing JSON: {str(json_error)}")
-                
-                # Try direct access if JSON parsing fails
+            # Parse and validate in one pass, filling in any fields the agent left out
+            if isinstance(response_text, dict):
+                research = MarketResearchResults.model_validate(response_text)
+                logger.debug("Using result.final_output directly as dictionary")
+            else:
+                response_str = str(response_text)
                 try:
-                    if hasattr(result, 'final_output') and isinstance(result.final_output, dict):
-                        research_data = result.final_output
-                        print(f"Using result.final_output directly as dictionary")
-                        logging.info(f"Using result.final_output directly as dictionary")
-                    else:
-                        raise ValueError("Could not extract JSON from response")
-                except Exception as direct_error:
-                    print(f"ERROR USING DIRECT OUTPUT: {str(direct_error)}")
-                    logging.error(f"Error using direct output: {str(direct_error)}")
-                    raise json_error  # Re-raise the original JSON error
-            
-            # Validate required fields
-            print("\nVALIDATING AND FILLING MISSING FIELDS...")
-            if "summary" not in research_data:
-                research_data["summary"] = "No summary available"
-                print("- Added missing 'summary' field")
-            if "competitors" not in research_data:
-                research_data["competitors"] = []
-                print("- Added missing 'competitors' field")
-            if "market_size" not in research_data:
-                research_data["market_size"] = {}
-                print("- Added missing 'market_size' field")
-            if "trends" not in research_data:
-                research_data["trends"] = []
-                print("- Added missing 'trends' field")
+                    research = MarketResearchResults.model_validate_json(
+                        response_str[response_str.find("{"):response_str.rfind("}") + 1]
+                    )
+                except ValidationError as json_error:
+                    # Fall back to the contents of a fenced code block
+                    logger.warning("Could not parse JSON object directly, trying code blocks: %s", json_error)
+                    json_match = _JSON_FENCE.search(response_str)
+                    if not json_match:
+                        raise
+                    research = MarketResearchResults.model_validate_json(json_match.group(1).strip())
+            research_data = research.model_dump()
             
-            # Ensure market_size_sources exists and has required fields
-            if "market_size_sources" not in research_data:
-                print("- WARNING: 'market_size_sources' not found in response, creating empty dictionary")
-                logging.warning("market_size_sources not found in response, creating empty dictionary")
-                research_data["market_size_sources"] = {}
+            # Explicit nulls from the agent become empty values
+            research_data["competitors"] = research_data["competitors"] or []
+            research_data["trends"] = research_data["trends"] or []
+            market_size = research_data["market_size"] = research_data["market_size"] or {}
             
             # Ensure search sources for all market metrics
-            search_base = f"https://www.google.com/search?q="
-            
-            if "overall" not in research_data["market_size_sources"] or not research_data["market_size_sources"]["overall"]:
-                search_query = f"{context_extraction.industry}+market+size+{research_data['market_size'].get('overall', '')}"
-                research_data["market_size_sources"]["overall"] = search_base + search_query.replace(" ", "+")
-                print(f"- WARNING: Added fallback source for overall market size: {research_data['market_size_sources']['overall']}")
-                logging.warning(f"Missing source for overall market size, using search URL: {research_data['market_size_sources']['overall']}")
-            
-            if "growth" not in research_data["market_size_sources"] or not research_data["market_size_sources"]["growth"]:
-                search_query = f"{context_extraction.industry}+market+growth+rate+{research_data['market_size'].get('growth', '')}"
-                research_data["market_size_sources"]["growth"] = search_base + search_query.replace(" ", "+")
-                print(f"- WARNING: Added fallback source for growth rate: {research_data['market_size_sources']['growth']}")
-                logging.warning(f"Missing source for growth rate, using search URL: {research_data['market_size_sources']['growth']}")
-            
-            if "projection" not in research_data["market_size_sources"] or not research_data["market_size_sources"]["projection"]:
-                search_query = f"{context_extraction.industry}+market+projection+future+{research_data['market_size'].get('projection', '')}"
-                research_data["market_size_sources"]["projection"] = search_base + search_query.replace(" ", "+")
-                print(f"- WARNING: Added fallback source for market projection: {research_data['market_size_sources']['projection']}")
-                logging.warning(f"Missing source for market projection, using search URL: {research_data['market_size_sources']['projection']}")
+            sources = research_data["market_size_sources"]
+            if not isinstance(sources, dict):
+                sources = research_data["market_size_sources"] = {}
+            for metric, search_tmpl in _SOURCE_SEARCH_TMPL.items():
+                if not sources.get(metric):
+                    value_q = quote_plus(str(market_size.get(metric, "")))
+                    sources[metric] = f"{search_tmpl.format(industry=industry_q)}+{value_q}"
+                    logger.warning("Missing source for %s, using search URL: %s", metric, sources[metric])
             
             # Ensure trends_source exists
-            if "trends_source" not in research_data or not research_data["trends_source"]:
-                search_query = f"{context_extraction.industry}+market+trends+{'+'.join(context_extraction.verticals)}"
-                research_data["trends_source"] = search_base + search_query.replace(" ", "+")
-                print(f"- WARNING: Added fallback source for trends: {research_data['trends_source']}")
-                logging.warning(f"Missing source for trends, using search URL: {research_data['trends_source']}")
-            
-            if "growth_calculation" not in research_data:
-                research_data["growth_calculation"] = "No growth calculation provided"
-                print("- Added missing 'growth_calculation' field")
-                
-            # Log the final data structure being returned
-            print("\nFINAL RESPONSE STRUCTURE:")
-            print("-"*60)
-            print(f"Fields: {', '.join(research_data.keys())}")
-            print(f"Market Size Sources: {research_data['market_size_sources']}")
-            print(f"Trends Source: {research_data['trends_source']}")
-            print(f"Competitors: {len(research_data['competitors'])}")
-            print(f"Trends: {len(research_data['trends'])}")
-            print("="*80)
+            if not research_data.get("trends_source"):
+                research_data["trends_source"] = trends_search
+                logger.warning("Missing source for trends, using search URL: %s", trends_search)
             
-            logging.info(f"Returning research data with fields: {research_data.keys()}")
-            logging.info(f"market_size_sources: {research_data['market_size_sources']}")
-            logging.info(f"trends_source: {research_data['trends_source']}")
-                
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    "Returning research data with fields=%s competitors=%d trends=%d",
+                    list(research_data), len(research_data["competitors"]), len(research_data["trends"])
+                )
+            _market_research_cache.set(cache_key, research_data)
             return research_data
         except Exception as e:
-            # Log the details of the error
-            print("\nERROR IN MARKET RESEARCH AGENT:")
-            print("-"*60)
-            print(f"Error: {str(e)}")
-            print("See logs for full stack trace")
-            print("-"*60)
-            
-            logging.error(f"Error in market research agent: {str(e)}")
-            logging.exception("Full exception details:")
-            
-            # Generate default search URLs
-            search_base = f"https://www.google.com/search?q="
-            overall_search = search_base + f"{context_extraction.industry}+market+size".replace(" ", "+")
-            growth_search = search_base + f"{context_extraction.industry}+market+growth+rate".replace(" ", "+")
-            projection_search = search_base + f"{context_extraction.industry}+market+projection+2030".replace(" ", "+")
-            trends_search = search_base + f"{context_extraction.industry}+market+trends+{'+'.join(context_extraction.verticals)}".replace(" ", "+")
-            
-            print("\nGENERATING FALLBACK RESPONSE WITH SEARCH URLS:")
-            print(f"- Overall Market Size: {overall_search}")
-            print(f"- Growth Rate: {growth_search}")
-            print(f"- Projection: {projection_search}")
-            print(f"- Trends: {trends_search}")
-            print("="*80)
+            logger.exception("Error in market research agent: %s", e)
             
             # Provide a fallback response with search URLs
-            return {
-                "summary": "Unable to complete market research due to an error.",
-                "competitors": [],
-                "market_size": {"overall": "Unknown"},
-                "trends": [],
-                "market_size_sources": {
-                    "overall": overall_search,
-                    "growth": growth_search,
-                    "projection": projection_search
+            return MarketResearchResults(
+                summary="Unable to complete market research due to an error.",
+                market_size={"overall": "Unknown"},
+                market_size_sources={
+                    metric: search_tmpl.format(industry=industry_q)
+                    for metric, search_tmpl in _SOURCE_SEARCH_TMPL.items()
                 },
-                "trends_source": trends_search,
-                "growth_calculation": ""
-            } 
+                trends_source=trends_search,
+                growth_calculation=""
+            ).model_dump()
+
+# Generated decks keyed by a digest of everything that goes into the prompts
+_pitch_deck_cache = TTLCache(maxsize=128, ttl=3600)
+
+def _pitch_deck_cache_key(
+    context_extraction: PitchContextExtraction,
+    market_research: Optional[Dict[str, Any]],
+    pitch_evaluation: Optional[PitchEvaluation],
+) -> bytes:
+    """Digest the deck inputs by content, so equal inputs from different requests match"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(context_extraction.model_dump_json().encode())
+    digest.update(json.dumps(market_research, sort_keys=True, default=str).encode())
+    digest.update(pitch_evaluation.model_dump_json().encode() if pitch_evaluation else b"null")
+    return digest.digest()
+
+# Stable openings for the per-request deck prompts. They go first so every
+# request shares the same prefix with the agent instructions and only the
+# trailing context differs; keep per-request values out of them.
+PITCH_DECK_STABLE_PREFIX: Final[str] = textwrap.dedent("""\
+    Generate content for a pitch deck based on the context below and your web search.
+    Create compelling content for each slide in the pitch deck.
+    Follow the JSON structure exactly as specified for the PitchDeckContent output type.
+    
+    CONTEXT:
+    """)
+
+JSX_DECK_STABLE_PREFIX: Final[str] = textwrap.dedent("""\
+    Create a beautiful, professional pitch deck page using JSX and Tailwind CSS for the startup described below.
+    
+    DESIGN REQUIREMENTS:
+    
+    1. Use a modern, professional design with a cohesive color palette derived from the industry
+    2. For the startup's industry, consider using these color schemes:
+       - Technology/SaaS: Blue, purple gradients with white/light backgrounds
+       - Healthcare: Soft blues and greens with clean white space
+       - Finance: Navy blue, teal, with subtle gold accents
+       - Education: Sky blue, orange accents, warm colors
+       - E-commerce: Vibrant colors with clean white space
+    
+    3. Create visualizations for data points:
+       - Use a simulated pie chart or bar chart for market size data
+       - Create a timeline visualization for the Why Now section
+       - Add feature cards with icons for the Solution section
+    
+    4. Use iconography appropriate to the startup's industry
+    5. Include subtle animations and transitions (hover effects, etc.)
+    6. Ensure the design is fully responsive and looks great on all devices
+    7. Use visual hierarchy to draw attention to key points
+    8. Incorporate white space effectively for a clean, professional look
+    
+    The final JSX code must be complete and ready to use within a Next.js application, with all necessary imports.
+    
+    STARTUP:
+    """)
+
+# Returned when deck generation fails; frozen, so one instance is shared
+_DEFAULT_DECK_RESPONSE = PitchDeckResponse(
+    overview="Default overview content due to error",
+    problem="Default problem content due to error",
+    whynow="Default why now content due to error",
+    solution="Default solution content due to error",
+    market="Default market content due to error",
+    jsx_code="// Error generating JSX component"
+)
+
+# Per-request sections of the deck prompts, appended after the stable prefixes
+_DECK_CONTEXT_TMPL = string.Template(textwrap.dedent("""
+    INDUSTRY: $industry
+    VERTICALS: $verticals
+    PROBLEM: $problem
+    SUMMARY: $summary
+    """))
+
+_DECK_RESEARCH_TMPL = string.Template(textwrap.dedent("""
+    MARKET RESEARCH:
+    
+    Market Size: $overall
+    Growth Rate: $growth
+    Future Projection: $projection
+    
+    Competitors: $competitors
+    
+    Market Trends:
+    $trends
+    """))
+
+_DECK_FEEDBACK_TMPL = string.Template(textwrap.dedent("""
+    PITCH FEEDBACK:
+    
+    Content Feedback: $content_feedback
+    Structure Feedback: $structure_feedback
+    """))
+
+_JSX_CONTENT_TMPL = string.Template(textwrap.dedent("""
+    Industry: $industry
+    Problem: $problem
+    
+    SLIDE CONTENT:
+    
+    OVERVIEW:
+    $overview
+    
+    PROBLEM:
+    $problem_slide
+    
+    WHY NOW:
+    $whynow
+    
+    SOLUTION:
+    $solution
+    
+    MARKET:
+    $market
+    
+    MARKET RESEARCH:
+    $summary
+    
+    Competitors: $competitors
+    
+    Market Size: $overall
+    Market Growth: $growth
+    """))
 
 async def generate_pitch_deck_content(
     context_extraction: PitchContextExtraction,
@@ -661,143 +784,83 @@ async def generate_pitch_deck_content(
     Returns:
         PitchDeckResponse object containing pitch deck content and JSX code
     """
-    print("="*80)
-    print(f"PITCH DECK CONTENT GENERATION STARTED FOR: {context_extraction.industry}")
-    print(f"VERTICALS: {', '.join(context_extraction.verticals)}")
-    print(f"PROBLEM: {context_extraction.problem}")
-    print("="*80)
-    
-    # Create the prompt with all available context
-    prompt = f"""
-    Generate content for a pitch deck with the following context:
+    cache_key = _pitch_deck_cache_key(context_extraction, market_research, pitch_evaluation)
+    cached = _pitch_deck_cache.get(cache_key)
+    if cached is not None:
+        logger.info("Returning cached pitch deck for industry: %s", context_extraction.industry)
+        return cached
+    
+    logger.debug(
+        "Pitch deck content generation started for industry=%s verticals=%s problem=%s",
+        context_extraction.industry, context_extraction.verticals, context_extraction.problem
+    )
     
-    INDUSTRY: {context_extraction.industry}
-    VERTICALS: {', '.join(context_extraction.verticals)}
-    PROBLEM: {context_extraction.problem}
-    SUMMARY: {context_extraction.summary}
-    
-    """
+    # Create the prompt: stable instructions first, then all available context
+    prompt_parts = [
+        PITCH_DECK_STABLE_PREFIX,
+        _DECK_CONTEXT_TMPL.substitute(
+            industry=context_extraction.industry,
+            verticals=", ".join(context_extraction.verticals),
+            problem=context_extraction.problem,
+            summary=context_extraction.summary,
+        ),
+    ]
     
     # Add market research context if available
     if market_research:
-        prompt += f"""
-        MARKET RESEARCH:
-        
-        Market Size: {market_research.get('market_size', {}).get('overall', 'Not available')}
-        Growth Rate: {market_research.get('market_size', {}).get('growth', 'Not available')}
-        Future Projection: {market_research.get('market_size', {}).get('projection', 'Not available')}
-        
-        Competitors: {', '.join([comp.get('name', '') for comp in market_research.get('competitors', [])])}
-        
-        Market Trends:
-        {' '.join([f"- {trend.get('title', '')}" for trend in market_research.get('trends', [])])}
-        """
+        market_size = market_research.get('market_size', {})
+        prompt_parts.append(_DECK_RESEARCH_TMPL.substitute(
+            overall=market_size.get('overall', 'Not available'),
+            growth=market_size.get('growth', 'Not available'),
+            projection=market_size.get('projection', 'Not available'),
+            competitors=', '.join(comp.get('name', '') for comp in market_research.get('competitors', ())),
+            trends='\n'.join(f"- {trend.get('title', '')}" for trend in market_research.get('trends', ())),
+        ))
     
     # Add pitch evaluation feedback if available
     if pitch_evaluation:
-        prompt += f"""
-        PITCH FEEDBACK:
-        
-        Content Feedback: {pitch_evaluation.content_feedback}
-        Structure Feedback: {pitch_evaluation.structure_feedback}
-        """
+        prompt_parts.append(_DECK_FEEDBACK_TMPL.substitute(
+            content_feedback=pitch_evaluation.content_feedback,
+            structure_feedback=pitch_evaluation.structure_feedback,
+        ))
     
-    prompt += """
-    Based on this context and your web search, create compelling content for each slide in the pitch deck.
-    Follow the JSON structure exactly as specified for the PitchDeckContent output type.
-    """
+    prompt = "".join(prompt_parts)
     
-    print("\nSENDING PROMPT TO PITCH DECK CONTENT AGENT:")
-    print("-"*60)
-    print(prompt.strip())
-    print("-"*60)
+    logger.debug("Sending prompt to pitch deck content agent:\n%s", prompt)
     
     try:
-        print("\nWAITING FOR AGENT RESPONSE...")
         # Run the pitch deck content generation with tracing
-        with trace("Pitch Deck Content Generation") as current_trace:
-            result = await Runner.run(
+        with trace("Pitch Deck Content Generation"):
+            result = await _run_agent(
                 pitch_deck_content_agent,
                 prompt
             )
         
-        print("\nAGENT RESPONSE RECEIVED")
+        logger.debug("Pitch deck content agent response received")
         
-        # Convert the Pydantic model to a PitchDeckResponse object
-        deck_content = result.final_output
-        if isinstance(deck_content, PitchDeckContent):
-            print("Converting Pydantic model to PitchDeckResponse")
-            deck_content_dict = deck_content.dict()
-        else:
-            print(f"Response is type {type(deck_content)}, attempting to convert to dict")
-            # Create a simple dictionary representation
-            deck_content_dict = {
-                "overview": str(getattr(deck_content, "overview", "No overview content")),
-                "problem": str(getattr(deck_content, "problem", "No problem content")),
-                "whynow": str(getattr(deck_content, "whynow", "No why now content")),
-                "solution": str(getattr(deck_content, "solution", "No solution content")),
-                "market": str(getattr(deck_content, "market", "No market content"))
-            }
+        # The agent's output_type guarantees a PitchDeckContent
+        deck_content_dict = result.final_output.model_dump()
         
         # Now generate the JSX code based on the content
-        jsx_prompt = f"""
-        Create a beautiful, professional pitch deck page using JSX and Tailwind CSS for the following startup:
-        
-        Industry: {context_extraction.industry}
-        Problem: {context_extraction.problem}
-        
-        SLIDE CONTENT:
-        
-        OVERVIEW:
-        {deck_content_dict["overview"]}
-        
-        PROBLEM:
-        {deck_content_dict["problem"]}
-        
-        WHY NOW:
-        {deck_content_dict["whynow"]}
-        
-        SOLUTION:
-        {deck_content_dict["solution"]}
-        
-        MARKET:
-        {deck_content_dict["market"]}
-        
-        MARKET RESEARCH:
-        {market_research["summary"] if market_research and "summary" in market_research else ""}
-        
-        Competitors: {", ".join([comp.get("name", "Unknown") for comp in market_research.get("competitors", [])][:3]) if market_research else ""}
-        
-        Market Size: {market_research.get("market_size", {}).get("overall", "Unknown") if market_research else "Unknown"}
-        Market Growth: {market_research.get("market_size", {}).get("growth", "Unknown") if market_research else "Unknown"}
-        
-        DESIGN REQUIREMENTS:
-        
-        1. Use a modern, professional design with a cohesive color palette derived from the industry
-        2. For {context_extraction.industry}, consider using these color schemes:
-           - Technology/SaaS: Blue, purple gradients with white/light backgrounds
-           - Healthcare: Soft blues and greens with clean white space
-           - Finance: Navy blue, teal, with subtle gold accents
-           - Education: Sky blue, orange accents, warm colors
-           - E-commerce: Vibrant colors with clean white space
-        
-        3. Create visualizations for data points:
-           - Use a simulated pie chart or bar chart for market size data
-           - Create a timeline visualization for the Why Now section
-           - Add feature cards with icons for the Solution section
-        
-        4. Use iconography appropriate to {context_extraction.industry} industry
-        5. Include subtle animations and transitions (hover effects, etc.)
-        6. Ensure the design is fully responsive and looks great on all devices
-        7. Use visual hierarchy to draw attention to key points
-        8. Incorporate white space effectively for a clean, professional look
-        
-        The final JSX code must be complete and ready to use within a Next.js application, with all necessary imports.
-        """
+        research = market_research or {}
+        research_size = research.get("market_size", {})
+        jsx_prompt = JSX_DECK_STABLE_PREFIX + _JSX_CONTENT_TMPL.substitute(
+            industry=context_extraction.industry,
+            problem=context_extraction.problem,
+            overview=deck_content_dict["overview"],
+            problem_slide=deck_content_dict["problem"],
+            whynow=deck_content_dict["whynow"],
+            solution=deck_content_dict["solution"],
+            market=deck_content_dict["market"],
+            summary=research.get("summary", ""),
+            competitors=", ".join(comp.get("name", "Unknown") for comp in islice(research.get("competitors", ()), 3)),
+            overall=research_size.get("overall", "Unknown"),
+            growth=research_size.get("growth", "Unknown"),
+        )
         
-        print("\nGENERATING JSX COMPONENT...")
-        with trace("JSX Pitch Deck Generation") as jsx_trace:
-            jsx_result = await Runner.run(
+        logger.debug("Generating JSX component")
+        with trace("JSX Pitch Deck Generation"):
+            jsx_result = await _run_agent(
                 jsx_pitch_deck_agent,
                 jsx_prompt
             )
@@ -814,34 +877,17 @@ async def generate_pitch_deck_content(
                 jsx_code_lines = jsx_code_lines[:-1]
             jsx_code = "\n".join(jsx_code_lines)
         
-        # Return a PitchDeckResponse object
-        return PitchDeckResponse(
-            overview=deck_content_dict["overview"],
-            problem=deck_content_dict["problem"],
-            whynow=deck_content_dict["whynow"],
-            solution=deck_content_dict["solution"],
-            market=deck_content_dict["market"],
+        # Return a PitchDeckResponse object; every field comes from agent
+        # outputs the SDK already validated, so skip re-validation
+        deck_response = PitchDeckResponse.model_construct(
+            **deck_content_dict,
             jsx_code=jsx_code
         )
+        _pitch_deck_cache.set(cache_key, deck_response)
+        return deck_response
         
     except Exception as e:
-        print(f"\nERROR IN PITCH DECK CONTENT AGENT: {str(e)}")
-        logging.error(f"Error generating pitch deck content: {str(e)}")
+        logger.exception("Error generating pitch deck content: %s", e)
         
         # Return default structure if error occurs
-        default_content = PitchDeckContent(
-            overview="Default overview content due to error",
-            problem="Default problem content due to error",
-            whynow="Default why now content due to error",
-            solution="Default solution content due to error",
-            market="Default market content due to error"
-        )
-        
-        return PitchDeckResponse(
-            overview=default_content.overview,
-            problem=default_content.problem,
-            whynow=default_content.whynow,
-            solution=default_content.solution,
-            market=default_content.market,
-            jsx_code="// Error generating JSX component"
-        ) 
\ No newline at end of file
+        return _DEFAULT_DECK_RESPONSE 
\ No newline at end of file
@@ -1,35 +1,83 @@
-from typing import Dict, Any, List, Optional
+from typing import AsyncIterator, Dict, Any, List, Optional
 from sqlalchemy.orm import Session
 import logging
+import os
+from contextlib import aclosing
 from app.models.models import Conversation, Message
 from app.schemas.schemas import MessageCreate, ConversationCreate
 from app.services.chat_service import ChatService
-from app.core.agent_utils import chat_response, analyze_pitch
+from app.core.cache import TTLCache
+from app.core.agent_utils import chat_response, stream_chat_response, analyze_pitch
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-async def process_chat_message(
+# Formatted message history per conversation id. It is extended after each
+# stored turn, so follow-up messages skip re-reading the whole conversation.
+# The TTL bounds staleness when another worker writes to the same conversation.
+_history_cache = TTLCache(maxsize=512, ttl=1800)
+
+# Number of most recent messages kept as context, so prompt size and history
+# reads stay bounded however long a conversation runs
+HISTORY_WINDOW = int(os.getenv("CHAT_HISTORY_WINDOW", "20"))
+
+# Reply shown for a structured pitch analysis, filled from PitchEvaluation fields
+_STRUCTURED_RESPONSE_TMPL = """Pitch Analysis Results:
+Clarity: {clarity}/5
+Content: {content}/5
+Structure: {structure}/5
+Delivery: {delivery}/5
+
+Detailed Feedback:
+{feedback}"""
+
+async def _generate_response(
+    message_content: str,
+    message_history: List[Dict[str, Any]],
+    use_structured_output: bool
+) -> str:
+    """
+    Generate the AI reply to a user message using OpenAI Agents.
+    
+    Args:
+        message_content: The user's message
+        message_history: Previous messages in the conversation, excluding this one
+        use_structured_output: Whether to use structured output
+        
+    Returns:
+        The AI response text
+    """
+    if use_structured_output:
+        # Use pitch analysis agent for structured output
+        analysis_result = await analyze_pitch(
+            pitch_content=message_content,
+            conversation_history=message_history
+        )
+        # Format the structured response
+        return _STRUCTURED_RESPONSE_TMPL.format_map(analysis_result.model_dump())
+    
+    # Use chat agent for regular responses
+    return await chat_response(
+        user_input=message_content,
+        conversation_history=message_history
+    )
+
+async def get_or_create_conversation(
     db: Session,
     message_content: str,
     conversation_id: Optional[str] = None,
-    user_id: Optional[str] = None,
-    use_structured_output: bool = False
-) -> Dict[str, Any]:
+    user_id: Optional[str] = None
+) -> Conversation:
     """
-    Process a chat message and generate a response using OpenAI Agents.
-    This function handles the entire flow from database operations to AI response generation.
+    Get a conversation by ID, or create one titled after the first message.
     
     Args:
         db: Database session
-        message_content: The user's message
+        message_content: The user's message, used for the title of a new conversation
         conversation_id: Optional conversation ID
         user_id: Optional user ID
-        use_structured_output: Whether to use structured output
         
     Returns:
-        Dictionary containing the AI response and conversation ID
+        The existing or newly created conversation
     """
     # Get or create conversation
     if conversation_id:
@@ -50,41 +98,51 @@ async def process_chat_message(
             ConversationCreate(title=title, user_id=user_id)
         )
     
-    # Save user message
-    user_message = await ChatService.create_message(
-        db,
-        MessageCreate(role="user", content=message_content),
-        conversation.id
-    )
+    return conversation
+
+async def _get_history(db: Session, conversation: Conversation) -> List[Dict[str, Any]]:
+    """Get the latest HISTORY_WINDOW messages of a conversation, reading them from the database on a cache miss"""
+    message_history = _history_cache.get(conversation.id)
+    if message_history is None:
+        messages = await ChatService.get_conversation_messages(db, conversation.id, limit=HISTORY_WINDOW)
+        message_history = await ChatService.format_messages_for_langchain(messages)
+        _history_cache.set(conversation.id, message_history)
+    return message_history
+
+def _append_turn(message_history: List[Dict[str, Any]], message_content: str, ai_response: str) -> None:
+    """Extend the cached history with a stored turn, dropping messages that fall out of the window"""
+    message_history.append({"role": "user", "content": message_content})
+    message_history.append({"role": "assistant", "content": ai_response})
+    del message_history[:-HISTORY_WINDOW]
+
+async def process_chat_message(
+    db: Session,
+    message_content: str,
+    conversation_id: Optional[str] = None,
+    user_id: Optional[str] = None,
+    use_structured_output: bool = False
+) -> Dict[str, Any]:
+    """
+    Process a chat message and generate a response using OpenAI Agents.
+    This function handles the entire flow from database operations to AI response generation.
+    
+    Args:
+        db: Database session
+        message_content: The user's message
+        conversation_id: Optional conversation ID
+        user_id: Optional user ID
+        use_structured_output: Whether to use structured output
+        
+    Returns:
+        Dictionary containing the AI response and conversation ID
+    """
+    conversation = await get_or_create_conversation(db, message_content, conversation_id, user_id)
     
-    # Get conversation history
-    messages = await ChatService.get_conversation_messages(db, conversation.id)
-    message_history = await ChatService.format_messages_for_langchain(messages)
+    # Get conversation history before this turn
+    message_history = await _get_history(db, conversation)
     
     try:
-        # Generate AI response using OpenAI Agents
-        if use_structured_output:
-            # Use pitch analysis agent for structured output
-            analysis_result = await analyze_pitch(
-                pitch_content=message_content,
-                conversation_history=message_history[:-1]  # Exclude the last message
-            )
-            # Format the structured response
-            ai_response = f"""Pitch Analysis Results:
-Clarity: {analysis_result.clarity}/5
-Content: {analysis_result.content}/5
-Structure: {analysis_result.structure}/5
-Delivery: {analysis_result.delivery}/5
-
-Detailed Feedback:
-{analysis_result.feedback}"""
-        else:
-            # Use chat agent for regular responses
-            ai_response = await chat_response(
-                user_input=message_content,
-                conversation_history=message_history[:-1]  # Exclude the last message
-            )
-        
+        ai_response = await _generate_response(message_content, message_history, use_structured_output)
         logger.info(f"Generated response for conversation {conversation.id}")
     except Exception as e:
         # Log the error
@@ -93,15 +151,73 @@ Detailed Feedback:
         # Fallback response
         ai_response = "I'm sorry, I encountered an error processing your request. Please try again later."
     
-    # Save AI message
-    ai_message = await ChatService.create_message(
+    # Save the user and AI messages in one transaction
+    await ChatService.create_messages(
         db,
-        MessageCreate(role="assistant", content=ai_response),
+        [
+            MessageCreate(role="user", content=message_content),
+            MessageCreate(role="assistant", content=ai_response)
+        ],
         conversation.id
     )
     
+    # Both turns are stored, so extend the cached history in place
+    _append_turn(message_history, message_content, ai_response)
+    
     return {
         "response": ai_response,
         "conversation_id": conversation.id,
         "structured": use_structured_output
-    } 
\ No newline at end of file
+    } 
+
+async def process_chat_message_stream(
+    db: Session,
+    message_content: str,
+    conversation: Conversation
+) -> AsyncIterator[str]:
+    """
+    Process a chat message and stream the chat agent's response.
+    The user message and response are saved to the conversation once the
+    stream completes. If the client disconnects part way through, the
+    truncated reply is not saved.
+    
+    Args:
+        db: Database session
+        message_content: The user's message
+        conversation: The conversation, from get_or_create_conversation
+        
+    Yields:
+        Pieces of the AI response text
+    """
+    message_history = await _get_history(db, conversation)
+    
+    chunks: List[str] = []
+    try:
+        # aclosing releases the stream slot as soon as the client goes away
+        async with aclosing(stream_chat_response(
+            user_input=message_content,
+            conversation_history=message_history
+        )) as stream:
+            async for chunk in stream:
+                chunks.append(chunk)
+                yield chunk
+    except Exception as e:
+        # Log the error
+        logger.error(f"Error streaming response: {str(e)}")
+        
+        # Fallback response
+        fallback = "I'm sorry, I encountered an error processing your request. Please try again later."
+        chunks.append(fallback)
+        yield fallback
+    
+    # Save the user and AI messages in one transaction
+    ai_response = "".join(chunks)
+    await ChatService.create_messages(
+        db,
+        [
+            MessageCreate(role="user", content=message_content),
+            MessageCreate(role="assistant", content=ai_response)
+        ],
+        conversation.id
+    )
+    _append_turn(message_history, message_content, ai_response)
@@ -0,0 +1,17 @@
+import functools
+import os
+
+from dotenv import load_dotenv
+
+
+@functools.cache
+def load_env() -> None:
+    """
+    Load environment variables from .env once per process.
+
+    Set PEACHME_SKIP_DOTENV in deployments where the orchestrator already
+    provides the environment, to skip reading .env entirely.
+    """
+    if os.getenv("PEACHME_SKIP_DOTENV"):
+        return
+    load_dotenv()
@@ -0,0 +1,35 @@
+from typing import Optional
+import os
+
+import httpx
+from openai import AsyncOpenAI
+
+_client: Optional[AsyncOpenAI] = None
+
+def get_openai_client() -> AsyncOpenAI:
+    """
+    Get the process-wide OpenAI client, creating it on first use.
+
+    Agents, embeddings and transcription share this client so they reuse one
+    pool of keep-alive connections instead of paying a TCP+TLS handshake per call.
+    """
+    global _client
+    if _client is None:
+        _client = AsyncOpenAI(
+            # The SDK retries rate limits and 5xx responses with jittered exponential backoff
+            max_retries=int(os.getenv("OPENAI_MAX_RETRIES", "3")),
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+                # Web search and full-page JSX runs can take minutes, so keep the
+                # SDK's generous read timeout by default
+                timeout=httpx.Timeout(float(os.getenv("OPENAI_TIMEOUT", "600")), connect=5.0),
+            )
+        )
+    return _client
+
+async def close_openai_client() -> None:
+    """Close the shared client's connections, if it was created"""
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
@@ -0,0 +1,82 @@
+from typing import Optional
+import hashlib
+import logging
+
+import numpy as np
+
+from app.core.cache import TTLCache
+from app.core.openai_client import get_openai_client
+
+logger = logging.getLogger(__name__)
+
+
+class SemanticResponseCache:
+    """
+    Cache of agent responses looked up by embedding similarity of the query.
+
+    Embeddings are stored normalized in a fixed-size ring buffer, so a lookup
+    is a single matrix-vector product. Like TTLCache it lives in the worker
+    process and is meant to be used from the asyncio event loop.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.92,
+        maxsize: int = 1024,
+        model: str = "text-embedding-3-small",
+    ):
+        """
+        Args:
+            threshold: Minimum cosine similarity for a cached response to be reused
+            maxsize: Maximum number of entries before the oldest is overwritten
+            model: OpenAI embedding model used for queries
+        """
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self.model = model
+        self._matrix: Optional[np.ndarray] = None
+        self._responses: list = [None] * maxsize
+        self._size = 0
+        self._next = 0
+        # Embeddings by sha256 of (model, text), so repeated texts skip the API
+        self._embeddings = TTLCache(maxsize=4096)
+
+    async def embed(self, text: str) -> np.ndarray:
+        """Return the normalized embedding of text, calling the API only for text not yet embedded"""
+        key = hashlib.sha256(f"{self.model}\0{text}".encode()).digest()
+        embedding = self._embeddings.get(key)
+        if embedding is None:
+            response = await get_openai_client().embeddings.create(model=self.model, input=text)
+            embedding = np.asarray(response.data[0].embedding, dtype=np.float32)
+            embedding /= np.linalg.norm(embedding)
+            self._embeddings.set(key, embedding)
+        return embedding
+
+    def lookup(self, embedding: np.ndarray) -> Optional[str]:
+        """Return the response of the most similar cached query, or None below the threshold"""
+        if self._size == 0:
+            return None
+        sims = self._matrix[:self._size] @ embedding
+        best = int(np.argmax(sims))
+        if sims[best] < self.threshold:
+            return None
+        logger.debug("Semantic cache hit with similarity %.3f", sims[best])
+        return self._responses[best]
+
+    def add(self, embedding: np.ndarray, response: str) -> None:
+        """Store response for the query embedding, overwriting the oldest entry if full"""
+        if self._matrix is None:
+            self._matrix = np.empty((self.maxsize, embedding.shape[0]), dtype=np.float32)
+        self._matrix[self._next] = embedding
+        self._responses[self._next] = response
+        self._next = (self._next + 1) % self.maxsize
+        self._size = min(self._size + 1, self.maxsize)
+
+    def clear(self) -> None:
+        """Remove all entries"""
+        self._responses = [None] * self.maxsize
+        self._size = 0
+        self._next = 0
+
+    def __len__(self) -> int:
+        return self._size
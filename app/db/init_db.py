@@ -1,8 +1,6 @@
 from app.db.database import Base, engine
 import logging
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 def init_db():
@@ -10,12 +8,19 @@ def init_db():
     try:
         # Create all tables
         Base.metadata.create_all(bind=engine)
+        
+        # create_all skips tables that already exist, so add any new indexes to them
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=engine, checkfirst=True)
         logger.info("Database tables created successfully")
     except Exception as e:
         logger.error(f"Error initializing database: {str(e)}")
         raise e
 
 if __name__ == "__main__":
+    # Set up logging when run as a standalone script
+    logging.basicConfig(level=logging.INFO)
     logger.info("Creating database tables...")
     init_db()
     logger.info("Database initialization completed") 
\ No newline at end of file
@@ -1,34 +1,41 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
+from agents import set_default_openai_client
+from openai import OpenAIError
+import logging
 import os
-from dotenv import load_dotenv
+from app.core.config import load_env
 
-from app.api.routes import video_router
+from app.api.routes import video_router, chat_router
+from app.core.openai_client import get_openai_client, close_openai_client
 
 # Load environment variables
-load_dotenv()
+load_env()
 
-# Get CORS origins from environment variable
-CORS_ORIGINS = os.getenv("CORS_ORIGINS", "http://localhost:3000").split(",")
+logger = logging.getLogger(__name__)
 
-# For development, ensure all localhost origins are allowed
-CORS_ORIGINS.extend([
+# Get CORS origins from environment variable and, for development, ensure all
+# localhost origins are allowed; dict.fromkeys drops duplicates, keeping order
+CORS_ORIGINS = tuple(dict.fromkeys([
+    *(origin.strip() for origin in os.getenv("CORS_ORIGINS", "http://localhost:3000").split(",")),
     "http://localhost:3000",
     "http://127.0.0.1:3000",
     "http://localhost:8000",
     "http://127.0.0.1:8000",
     "http://localhost:8001",  # The current FastAPI port
     "http://127.0.0.1:8001"   # Alternative localhost notation
-])
+]))
 
 # Log the allowed origins for debugging
-print(f"CORS allowed origins: {CORS_ORIGINS}")
+logger.info(f"CORS allowed origins: {CORS_ORIGINS}")
 
 # Create FastAPI app
 app = FastAPI(
     title="PeachMe API",
     description="API for PeachMe video transcription and analysis",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # Add CORS middleware to allow cross-origin requests from frontend
@@ -38,10 +45,27 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # The chat stream returns the conversation ID in this header
+    expose_headers=["X-Conversation-Id"],
 )
 
 # Include routers
 app.include_router(video_router, prefix="/api/video")
+app.include_router(chat_router, prefix="/api/chat")
+
+@app.on_event("startup")
+async def startup():
+    """Run agents through the shared, connection-pooled OpenAI client"""
+    try:
+        set_default_openai_client(get_openai_client())
+    except OpenAIError as e:
+        # Keep serving without an API key; only the OpenAI-backed endpoints fail
+        logger.warning(f"OpenAI client not configured: {str(e)}")
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Close pooled connections to the OpenAI API"""
+    await close_openai_client()
 
 @app.get("/")
 async def root():
@@ -52,6 +76,9 @@ async def root():
             "video": {
                 "transcribe": "/api/video/transcribe",
                 "analyze": "/api/video/analyze"
+            },
+            "chat": {
+                "stream": "/api/chat/stream"
             }
         }
     }
@@ -1,25 +1,37 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
+import os
+import time
 import uuid
+from datetime import datetime
 from app.db.database import Base
 
 def generate_uuid():
-    """Generate a UUID string"""
-    return str(uuid.uuid4())
+    """
+    Generate a time-ordered UUIDv7 string (RFC 9562).
+    
+    The leading 48 bits are the Unix time in milliseconds, so new rows land at
+    the end of the primary key index instead of on a random page.
+    """
+    value = (time.time_ns() // 1_000_000) << 80 | int.from_bytes(os.urandom(10), "big")
+    # Set the version (7) and variant (0b10) bits
+    value = value & ~(0xF << 76) | (0x7 << 76)
+    value = value & ~(0x3 << 62) | (0x2 << 62)
+    return str(uuid.UUID(int=value))
 
 class Conversation(Base):
     """Conversation model for storing chat conversations"""
     __tablename__ = "conversations"
 
-    id = Column(String, primary_key=True, default=generate_uuid, index=True)
+    id = Column(String, primary_key=True, default=generate_uuid)
     title = Column(String, index=True)
     user_id = Column(String, index=True, nullable=True)  # Can be null for anonymous users
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
 
     # Relationship with messages
-    messages = relationship("Message", back_populates="conversation", cascade="all, delete-orphan")
+    messages = relationship("Message", back_populates="conversation", cascade="all, delete-orphan", order_by="Message.created_at")
 
     def __repr__(self):
         return f"<Conversation(id={self.id}, title={self.title}, user_id={self.user_id})>"
@@ -28,14 +40,21 @@ class Message(Base):
     """Message model for storing chat messages"""
     __tablename__ = "messages"
 
-    id = Column(String, primary_key=True, default=generate_uuid, index=True)
-    conversation_id = Column(String, ForeignKey("conversations.id"), index=True)
+    id = Column(String, primary_key=True, default=generate_uuid)
+    conversation_id = Column(String, ForeignKey("conversations.id"))
     role = Column(String, index=True)  # 'user' or 'assistant'
     content = Column(Text)
-    created_at = Column(DateTime, server_default=func.now())
+    # Set in Python so messages created in the same second still sort in order
+    created_at = Column(DateTime, default=datetime.utcnow, server_default=func.now())
 
     # Relationship with conversation
     conversation = relationship("Conversation", back_populates="messages")
 
+    # Serves conversation history reads as an ordered range scan; it also
+    # covers lookups by conversation_id alone
+    __table_args__ = (
+        Index("ix_messages_conv_created", "conversation_id", "created_at"),
+    )
+
     def __repr__(self):
         return f"<Message(id={self.id}, role={self.role}, conversation_id={self.conversation_id})>" 
\ No newline at end of file
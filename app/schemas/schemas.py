@@ -3,7 +3,7 @@ from typing import Optional, List, Dict, Any
 from pydantic import BaseModel, Field
 
 from dataclasses import dataclass
-@dataclass
+@dataclass(slots=True, frozen=True)
 class PitchContext:
     """Context for pitch-related operations"""
     conversation_history: List[Dict[str, Any]]
@@ -34,6 +34,10 @@ class PitchEvaluation(BaseModel):
     delivery_feedback: str = Field(description="Detailed feedback about delivery")
     feedback: str = Field(description="Overall feedback and suggestions")
 
+    model_config = {
+        "frozen": True
+    }
+
 class PitchContextExtraction(BaseModel):
     """Structured output for pitch context extraction"""
     industry: str = Field(description="The primary industry the pitch is focused on")
@@ -41,11 +45,15 @@ class PitchContextExtraction(BaseModel):
     problem: str = Field(description="The main problem or pain point the pitch addresses")
     summary: str = Field(description="Brief summary of the pitch context")
 
+    model_config = {
+        "frozen": True
+    }
+
 class MarketResearchResults(BaseModel):
     """Structured output for market research"""
     summary: Optional[str] = Field(
         description="Brief summary of research findings",
-        default=""
+        default="No summary available"
     )
     competitors: Optional[List[Dict[str, Any]]] = Field(
         description="List of competitors in the problem space",
@@ -55,7 +63,9 @@ class MarketResearchResults(BaseModel):
         description="Market size information for the industry and verticals",
         default_factory=dict
     )
-    market_size_sources: Optional[Dict[str, str]] = Field(
+    # Source fields are only echoed back, so any shape the agent returns is
+    # accepted rather than failing the whole research result
+    market_size_sources: Optional[Any] = Field(
         description="Source URLs for each market size metric (overall, growth, projection)",
         default_factory=dict
     )
@@ -63,15 +73,19 @@ class MarketResearchResults(BaseModel):
         description="Key market trends",
         default_factory=list
     )
-    trends_source: Optional[str] = Field(
+    trends_source: Optional[Any] = Field(
         description="Source URL for market trends information",
         default=""
     )
-    growth_calculation: Optional[str] = Field(
+    growth_calculation: Optional[Any] = Field(
         description="Explanation of how projected growth was calculated",
-        default=""
+        default="No growth calculation provided"
     )
 
+    model_config = {
+        "frozen": True
+    }
+
 class PitchDeckContent(BaseModel):
     """Structured output for pitch deck content generation"""
     overview: str = Field(
@@ -90,6 +104,10 @@ class PitchDeckContent(BaseModel):
         description="Content for the market opportunity slide"
     )
 
+    model_config = {
+        "frozen": True
+    }
+
 class JSXPitchDeckOutput(BaseModel):
     """Output containing the JSX component for a pitch deck"""
     jsx_code: str = Field(
@@ -105,6 +123,10 @@ class PitchDeckResponse(BaseModel):
     market: str = Field(description="Content for the market opportunity slide")
     jsx_code: str = Field(description="The complete JSX code for the pitch deck component")
 
+    model_config = {
+        "frozen": True
+    }
+
 
 
 class MessageBase(BaseModel):
@@ -159,6 +181,7 @@ class Conversation(ConversationBase):
 class ChatRequest(BaseModel):
     """Schema for chat request"""
     message: str
+    conversation_id: Optional[str] = None
 
 # Chat response schema
 
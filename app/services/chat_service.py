@@ -1,5 +1,6 @@
 from sqlalchemy.orm import Session
 from typing import List, Optional, Dict, Any
+from datetime import datetime, timedelta
 from app.models.models import Conversation, Message
 from app.schemas.schemas import ConversationCreate, MessageCreate
 
@@ -37,9 +38,14 @@ class ChatService:
         return db_message
     
     @staticmethod
-    async def get_conversation_messages(db: Session, conversation_id: str) -> List[Message]:
-        """Get all messages in a conversation"""
-        return db.query(Message).filter(Message.conversation_id == conversation_id).order_by(Message.created_at).all()
+    async def create_messages(db: Session, messages: List[MessageCreate], conversation_id: str) -> List[Message]:
+        """Create several messages in a conversation in a single commit"""
+        return ChatService.create_messages_sync(db, messages, conversation_id)
+    
+    @staticmethod
+    async def get_conversation_messages(db: Session, conversation_id: str, limit: Optional[int] = None) -> List[Message]:
+        """Get the messages in a conversation, or only the latest `limit` of them"""
+        return ChatService.get_conversation_messages_sync(db, conversation_id, limit)
     
     @staticmethod
     async def format_messages_for_langchain(messages: List[Message]) -> List[Dict[str, Any]]:
@@ -84,6 +90,30 @@ class ChatService:
         return db_message
     
     @staticmethod
-    def get_conversation_messages_sync(db: Session, conversation_id: str) -> List[Message]:
-        """Get all messages in a conversation (sync version)"""
-        return db.query(Message).filter(Message.conversation_id == conversation_id).order_by(Message.created_at).all() 
\ No newline at end of file
+    def create_messages_sync(db: Session, messages: List[MessageCreate], conversation_id: str) -> List[Message]:
+        """Create several messages in a conversation in a single commit (sync version)"""
+        # Stamp consecutive microseconds so the batch keeps its order by created_at
+        now = datetime.utcnow()
+        db_messages = [
+            Message(
+                role=message.role,
+                content=message.content,
+                conversation_id=conversation_id,
+                created_at=now + timedelta(microseconds=i)
+            )
+            for i, message in enumerate(messages)
+        ]
+        db.add_all(db_messages)
+        db.commit()
+        return db_messages
+    
+    @staticmethod
+    def get_conversation_messages_sync(db: Session, conversation_id: str, limit: Optional[int] = None) -> List[Message]:
+        """Get the messages in a conversation, or only the latest `limit` of them (sync version)"""
+        query = db.query(Message).filter(Message.conversation_id == conversation_id)
+        if limit is None:
+            return query.order_by(Message.created_at).all()
+        # Read the tail newest-first so the index scan stops after `limit` rows
+        messages = query.order_by(Message.created_at.desc()).limit(limit).all()
+        messages.reverse()
+        return messages
\ No newline at end of file
@@ -1,52 +1,73 @@
+import asyncio
 import subprocess
 import os
-from pathlib import Path
 import logging
-from openai import OpenAI
+import orjson
+from pathlib import Path
+from typing import BinaryIO
+from app.core.openai_client import get_openai_client
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def extract_audio(video_path: str, audio_path: str = "output_audio.mp3") -> str | None:
-    """Extract audio from video file using ffmpeg if needed."""
+# File extensions Whisper accepts directly, without converting through ffmpeg
+SUPPORTED_EXTS = ('.mp3', '.mp4', '.mpeg', '.mpga', '.m4a', '.wav', '.webm')
+
+async def extract_audio(video_path: str) -> str | bytes | None:
+    """
+    Extract audio from video file using ffmpeg if needed.
+    
+    Returns the original path if the file can be sent to Whisper as-is,
+    otherwise the extracted mono 16 kHz MP3 audio as bytes.
+    """
     try:
-        # Check if the file is already in a supported audio format
-        supported_audio_formats = ['.mp3', '.mp4', '.mpeg', '.mpga', '.m4a', '.wav', '.webm']
-        file_ext = os.path.splitext(video_path)[1].lower()
-        
         # Get file size in MB
         file_size_mb = os.path.getsize(video_path) / (1024 * 1024)
         logger.info(f"Processing file: {video_path} ({file_size_mb:.2f} MB)")
         
         # If file is small and already in supported format, just return it
-        if file_ext in supported_audio_formats and file_size_mb < 25:  # OpenAI has 25MB limit
-            logger.info(f"File is already in supported format ({file_ext}) and under size limit. Skipping conversion.")
+        if video_path.lower().endswith(SUPPORTED_EXTS) and file_size_mb < 25:  # OpenAI has 25MB limit
+            logger.info(f"File is already in supported format and under size limit. Skipping conversion.")
             return video_path
             
-        # Otherwise, extract audio to reduce size
+        # Otherwise, extract audio to reduce size; speech needs no more than
+        # mono 16 kHz, and piping the MP3 back avoids a temporary file
         logger.info(f"Converting video to audio format using ffmpeg")
-        command = ["ffmpeg", "-i", video_path, "-vn", "-acodec", "mp3", audio_path]
-        subprocess.run(command, check=True)
-        return audio_path
+        command = [
+            "ffmpeg", "-i", video_path, "-vn",
+            "-ac", "1", "-ar", "16000", "-b:a", "64k",
+            "-f", "mp3", "pipe:1"
+        ]
+        proc = await asyncio.create_subprocess_exec(
+            *command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+        )
+        stdout, stderr = await proc.communicate()
+        if proc.returncode != 0:
+            raise subprocess.CalledProcessError(proc.returncode, command, stderr=stderr)
+        return stdout
     except Exception as e:
         logger.error(f"Error extracting audio: {e}")
         return None
 
-def transcribe_audio(audio_path: str) -> dict:
-    """Transcribe audio using OpenAI's Whisper API with timestamps."""
+async def transcribe_audio(audio: str | bytes | BinaryIO) -> dict:
+    """Transcribe audio (a file path, MP3 bytes or an open binary file) using OpenAI's Whisper API with timestamps."""
     try:
-        client = OpenAI()
-
-        with open(audio_path, "rb") as audio_file:
-            result = client.audio.transcriptions.create(
-                model="whisper-1", 
-                file=audio_file,
-                response_format="verbose_json",
-                timestamp_granularities=["segment"]
-            )
+        if isinstance(audio, str):
+            # The async client reads Path uploads without blocking the event loop
+            file = Path(audio)
+        elif isinstance(audio, bytes):
+            # In-memory audio has no file name, so label it for the multipart upload
+            file = ("audio.mp3", audio, "audio/mpeg")
+        else:
+            file = audio
         
-        return result
+        # Long recordings can take minutes; the shared client's OPENAI_TIMEOUT
+        # and OPENAI_MAX_RETRIES are sized for that
+        return await get_openai_client().audio.transcriptions.create(
+            model="whisper-1", 
+            file=file,
+            response_format="verbose_json",
+            timestamp_granularities=["segment"]
+        )
     except Exception as e:
         logger.error(f"Error transcribing audio with OpenAI API: {e}")
         return None
@@ -57,31 +78,18 @@ def format_time(seconds: float) -> str:
     secs = seconds % 60
     return f"{minutes:02d}:{secs:05.2f}"
 
-def get_transcript(video_path: str) -> str:
+async def get_transcript(video_path: str) -> str:
     """Process video file and return transcript with timestamps using OpenAI's API."""
-    # Create media directory if it doesn't exist
-    media_dir = Path("media")
-    media_dir.mkdir(exist_ok=True)
-    
-    # Generate unique audio file path for potential conversion
-    audio_path = media_dir / "output_audio.mp3"
-    
     # Extract audio if needed (may return original file if it's already in the right format)
-    audio_file = extract_audio(video_path, str(audio_path))
-    if not audio_file:
+    audio = await extract_audio(video_path)
+    if not audio:
         return "Error: Could not process audio."
 
     # Transcribe audio using OpenAI API
-    result = transcribe_audio(audio_file)
+    result = await transcribe_audio(audio)
     if not result:
         return "Error: Could not transcribe audio."
     
-    # Clean up temporary files
-    # Only remove audio_file if it's different from the video_path (means we created a new file)
-    if os.path.exists(audio_file) and audio_file != video_path:
-        logger.info(f"Removing temporary audio file: {audio_file}")
-        os.remove(audio_file)
-        
     # Always remove the original video file when we're done
     if os.path.exists(video_path):
         logger.info(f"Removing original video file: {video_path}")
@@ -89,8 +97,6 @@ def get_transcript(video_path: str) -> str:
 
     # Return the OpenAI response as JSON
     try:
-        import json
-        
         # Convert the API response to a dictionary
         if hasattr(result, 'model_dump'):
             # If it's a Pydantic model or similar
@@ -108,7 +114,8 @@ def get_transcript(video_path: str) -> str:
         # Log the structure we're returning
         logger.info(f"Returning transcript with {len(result_dict.get('segments', []))} segments")
         
-        return json.dumps(result_dict)
+        # orjson writes UTF-8 directly; anything it can't encode natively becomes a string
+        return orjson.dumps(result_dict, default=str).decode()
     except Exception as e:
         logger.error(f"Error serializing result to JSON: {e}")
         return str(result)
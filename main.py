@@ -1,14 +1,15 @@
 import uvicorn
 import logging
-from app.main import app
-from app.db.init_db import init_db
 
-
-# Set up logging
+# Set up logging for the whole app, before any app module logs at import
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
 )
+
+from app.main import app
+from app.db.init_db import init_db
+
 logger = logging.getLogger(__name__)
 
 if __name__ == "__main__":